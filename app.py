@@ -1,18 +1,116 @@
+import csv
+import io
+import multiprocessing
 import os
 import re
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, date, timedelta
+from functools import lru_cache
+from operator import itemgetter
+from zipfile import ZipFile, ZIP_DEFLATED
 from flask import Flask, render_template, request, redirect, url_for, send_file, flash
 from flask_migrate import Migrate
 from werkzeug.utils import secure_filename
+import numpy as np
 import pandas as pd
 import openpyxl
-from openpyxl.styles import PatternFill, Font, Alignment, Border, Side
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import PatternFill, Font, Alignment, Border, Side, NamedStyle
 from openpyxl.utils import get_column_letter
-
-from models import db, Employee, Attendance
+from openpyxl.writer.excel import ExcelWriter
+from sqlalchemy import event
+
+try:
+    # Écriture xlsx en flux (constant_memory), optionnelle : openpyxl sinon
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+
+try:
+    # Lecteur Excel en Rust, optionnel : openpyxl / xlrd sont utilisés sinon
+    from python_calamine import CalamineWorkbook
+except ImportError:
+    CalamineWorkbook = None
+
+from models import db, Employee, Attendance, DataVersion, STATUS_KEYS, matricule_key
 import config
 
 UPLOAD_EXTENSIONS = ['.xlsx', '.xls', '.csv']
+# Nombre maximal de valeurs par clause IN lors de l'import
+IN_CHUNK_SIZE = 500
+# Nombre de présences lues par lot lors de l'export
+EXPORT_CHUNK_SIZE = 1000
+# Niveau de compression zip de l'export openpyxl (1 : ~2x plus rapide que 6, fichier un peu plus gros)
+EXPORT_ZIP_LEVEL = 1
+# Nombre de lignes par executemany INSERT ... ON CONFLICT / ON DUPLICATE KEY
+UPSERT_BATCH_SIZE = 500
+# Nombre maximal de processus d'analyse des feuilles par import
+PARSE_MAX_WORKERS = 4
+
+# Classement des libellés de statut, règles testées dans l'ordre :
+# (index dans STATUS_KEYS, alternatives de sous-chaînes devant toutes apparaître)
+_STATUS_RULES = (
+    (0, (('prés',), ('present',))),
+    (1, (('abs',),)),
+    (2, (('cong',),)),
+    (3, (('tour', 'rep'),)),
+    (4, (('repos',), ('méd',), ('med',))),
+    (5, (('sans', 'ph'),)),
+)
+
+# Couleurs d'en-tête de l'export : colonnes fixes / récapitulatif
+EXPORT_HEADER_COLOR = 'D3D3D3'
+EXPORT_RECAP_COLOR = 'FFCC99'
+
+# Colonnes du récapitulatif (_recap_query / _render_recap)
+RECAP_TEXT_COLUMNS = {
+    'matricule': 'Matricule',
+    'nom': 'Nom',
+    'prenom': 'Prénom',
+    'poste': 'Poste',
+    'site': 'Site',
+    'affaire': 'Affaire',
+    'classe': 'Classe',
+    'affectation': 'Affectation',
+    'ville': 'Ville',
+}
+RECAP_STATUS_COLUMNS = ['Présent', 'Absent', 'CONG', 'Tour_rep', 'Repos_med', 'Sans_ph']
+# Colonnes de taux du fichier -> attribut Employee (résolu une fois au chargement)
+TAUX_ATTRS = {key: attr for key, attr in (('taux_logement', 'taux_lgt'), ('taux_repas', 'taux_repas'))
+              if hasattr(Employee, attr)}
+# Colonnes fixes canoniques et variantes d'en-tête acceptées
+CANONICAL_FIXED = {
+    'matricule': ['matricule', 'id'],
+    'nom': ['nom', 'name'],
+    'prenom': ['prenom', 'prénom', 'prenom'],
+    'poste': ['poste', 'position'],
+    'site': ['site'],
+    'affaire': ['affaire'],
+    'classe': ['classe', 'class', 'niveau'],
+    'affectation': ['affectation', 'affect', 'assignment'],
+    'ville': ['ville', 'city'],
+    'taux_logement': ['tauxlogement', 'taux_logement', 'taux_lgt', 'taux logement', 'tauxlgt'],
+    'taux_repas': ['tauxrepas', 'taux_repas', 'taux repas', 'tauxrep']
+}
+# Index inversé variante -> (rang, colonne canonique) : une recherche par en-tête
+_FIXED_VARIANTS = {variant: (rank, canon)
+                   for rank, (canon, variants) in enumerate(CANONICAL_FIXED.items())
+                   for variant in variants}
+# Valeurs texte considérées comme "cochées" dans une cellule de statut
+TRUE_STRINGS = frozenset({'x', '1', 'yes', 'y', 'présent', 'present', 'p'})
+
+# Expressions régulières compilées une fois au chargement du module
+_NORM_RE = re.compile(r'[^A-Za-z0-9éèêàôùïçÉÀÈ]')
+_DATE_RE = re.compile(r'^\d{1,2}/\d{1,2}/\d{4}$')
+# Formats de date essayés, dans l'ordre, pour les en-têtes
+DATE_FORMATS = (
+    '%d/%m/%Y',  # DD/MM/YYYY
+    '%m/%d/%Y',  # MM/DD/YYYY
+    '%Y-%m-%d',  # YYYY-MM-DD
+    '%d-%m-%Y',  # DD-MM-YYYY
+    '%m-%d-%Y',  # MM-DD-YYYY
+)
 
 
 def create_app():
@@ -21,7 +119,6 @@ def create_app():
     db.init_app(app)
     Migrate(app, db)
 
-    os.makedirs(app.config.get('EXPORT_FOLDER', os.path.join(os.path.dirname(__file__), 'exports')), exist_ok=True)
     os.makedirs(app.config.get('UPLOAD_FOLDER', os.path.join(os.path.dirname(__file__), 'uploads')), exist_ok=True)
 
     with app.app_context():
@@ -64,9 +161,8 @@ def create_app():
         except Exception:
             start_date = end_date = None
 
-        recap_df = build_recap(start_date, end_date)
-        table_html = recap_df.to_html(classes='table table-striped table-sm', index=False) if not recap_df.empty else '<p>Aucune donnée</p>'
-        return render_template('index.html', table_html=table_html, start=start, end=end)
+        recap_html = _render_recap(start_date, end_date, _recap_token())
+        return render_template('index.html', recap_html=recap_html, start=start, end=end)
 
     @app.route('/export', methods=['GET'])
     def export():
@@ -88,327 +184,130 @@ def create_app():
             Attendance.date <= end_date
         )
 
-        rows = q.with_entities(
-            Attendance.date,
-            Employee.matricule, Employee.nom, Employee.prenom, Employee.poste,
-            Employee.site, Employee.affaire, Employee.classe, Employee.affectation, Employee.ville,
-            Employee.taux_lgt, Employee.taux_repas,
-            Attendance.present, Attendance.absent, Attendance.cong,
-            Attendance.tour_rep, Attendance.repos_med, Attendance.sans_ph
-        ).order_by(Employee.matricule.asc(), Attendance.date.asc()).all()
-
-        # Récupérer tous les employés (même ceux sans données dans la plage)
-        all_employees = Employee.query.order_by(Employee.matricule.asc()).all()
+        # Récupérer tous les employés (même ceux sans données dans la plage) :
+        # lecture seule, on ne charge que les colonnes utiles, sans instances ORM
+        all_employees = Employee.query.with_entities(
+            Employee.id, Employee.matricule, Employee.nom, Employee.prenom,
+            Employee.poste, Employee.site, Employee.affaire, Employee.classe,
+            Employee.affectation, Employee.ville, Employee.taux_lgt, Employee.taux_repas
+        ).order_by(Employee.matricule.asc()).all()
 
         if not all_employees:
             flash('Aucun employé trouvé', 'warning')
             return redirect(url_for('index'))
 
         # Créer toutes les dates de la plage
-        dates_set = set()
-        current_date = start_date
-        while current_date <= end_date:
-            dates_set.add(current_date)
-            current_date += timedelta(days=1)
-        
-        sorted_dates = sorted(list(dates_set))
+        sorted_dates = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+
+        # Informations fixes de chaque employé (ordre du matricule)
+        fixed_rows = [
+            [matricule]
+            + [value or '' for value in texts]
+            + [taux_lgt or 0.0, taux_repas or 0.0]
+            for _, matricule, *texts, taux_lgt, taux_repas in all_employees
+        ]
 
-        # Préparer les données pour l'export
-        employees_data = {}
-        employee_totals = {}
-        
-        # Initialiser avec tous les employés
-        for emp in all_employees:
-            employees_data[emp.matricule] = {
-                'matricule': emp.matricule,
-                'nom': emp.nom or '',
-                'prenom': emp.prenom or '',
-                'poste': emp.poste or '',
-                'site': emp.site or '',
-                'affaire': emp.affaire or '',
-                'classe': emp.classe or '',
-                'affectation': emp.affectation or '',
-                'ville': emp.ville or '',
-                'taux_lgt': emp.taux_lgt or 0.0,
-                'taux_repas': emp.taux_repas or 0.0,
-                'attendances': {}
-            }
-            
-            employee_totals[emp.matricule] = {
-                'present': 0,
-                'absent': 0,
-                'cong': 0,
-                'tour_rep': 0,
-                'repos_med': 0,
-                'sans_ph': 0
-            }
-
-        # Remplir avec les données existantes
-        for r in rows:
-            matricule = r[1]
-            date_obj = r[0]
-            
-            if matricule not in employees_data:
+        # Grille employés x dates x statuts (0 pour les dates sans données),
+        # remplie d'un bloc à partir des présences ; int16 comme la colonne
+        # StatusFlag (SMALLINT), les totaux sont cumulés en int64
+        grid = np.zeros((len(all_employees), len(sorted_dates), len(STATUS_KEYS)), dtype=np.int16)
+        emp_positions = {emp.id: i for i, emp in enumerate(all_employees)}
+
+        # Présences lues par lots (curseur côté serveur quand le SGBD le permet) :
+        # seul le lot courant est en mémoire, en colonnes (employee_id, date, statuts)
+        stmt = q.with_entities(
+            Attendance.employee_id, Attendance.date,
+            Attendance.present, Attendance.absent, Attendance.cong,
+            Attendance.tour_rep, Attendance.repos_med, Attendance.sans_ph
+        ).statement.execution_options(stream_results=True)
+        for attendances in pd.read_sql_query(stmt, db.session.connection(), chunksize=EXPORT_CHUNK_SIZE):
+            emp_index = attendances['employee_id'].map(emp_positions)
+            known = emp_index.notna().to_numpy()
+            if not known.any():
                 continue
-                
-            present_val = int(r[12] or 0)
-            absent_val = int(r[13] or 0)
-            cong_val = int(r[14] or 0)
-            tour_rep_val = int(r[15] or 0)
-            repos_med_val = int(r[16] or 0)
-            sans_ph_val = int(r[17] or 0)
-            
-            employees_data[matricule]['attendances'][date_obj] = {
-                'present': present_val,
-                'absent': absent_val,
-                'cong': cong_val,
-                'tour_rep': tour_rep_val,
-                'repos_med': repos_med_val,
-                'sans_ph': sans_ph_val
-            }
-            
-            # Mettre à jour les totaux
-            employee_totals[matricule]['present'] += present_val
-            employee_totals[matricule]['absent'] += absent_val
-            employee_totals[matricule]['cong'] += cong_val
-            employee_totals[matricule]['tour_rep'] += tour_rep_val
-            employee_totals[matricule]['repos_med'] += repos_med_val
-            employee_totals[matricule]['sans_ph'] += sans_ph_val
+            day_index = (pd.to_datetime(attendances['date']) - pd.Timestamp(start_date)).dt.days
+            grid[emp_index[known].astype(int), day_index[known]] = (
+                attendances.loc[known, list(STATUS_KEYS)].fillna(0).to_numpy(dtype=np.int16)
+            )
+        # Totaux par employé et par statut
+        totals = grid.sum(axis=1, dtype=np.int64)
 
         # Construire les en-têtes
         fixed_columns = ['Matricule', 'Nom', 'Prénom', 'Poste', 'Site', 'Affaire', 'Classe', 'Affectation', 'Ville', 'Taux Logement', 'Taux Repas']
         
         # Couleurs pour les dates (cycle jaune, vert, bleu)
         date_colors = [
-            PatternFill(start_color='FFFF99', end_color='FFFF99', fill_type='solid'),  # Jaune clair
-            PatternFill(start_color='CCFFCC', end_color='CCFFCC', fill_type='solid'),  # Vert clair
-            PatternFill(start_color='CCE5FF', end_color='CCE5FF', fill_type='solid')   # Bleu clair
+            'FFFF99',  # Jaune clair
+            'CCFFCC',  # Vert clair
+            'CCE5FF'   # Bleu clair
         ]
         
-        # En-têtes pour les totaux
-        total_headers_first = ['RÉCAPITULATIF'] * 6
-        total_headers_second = ['Présent', 'Absent', 'CONG', 'Tour_rep', 'Repos_med', 'Sans_ph']
-        
-        # Créer les données pour le DataFrame
-        columns_data = []
-        
-        # Préparer les données pour chaque employé
-        for emp_data in employees_data.values():
-            matricule = emp_data['matricule']
-            row_data = [
-                emp_data['matricule'],
-                emp_data['nom'],
-                emp_data['prenom'],
-                emp_data['poste'],
-                emp_data['site'],
-                emp_data['affaire'],
-                emp_data['classe'],
-                emp_data['affectation'],
-                emp_data['ville'],
-                emp_data['taux_lgt'],
-                emp_data['taux_repas']
-            ]
-            
-            # Ajouter les statuts pour chaque date (même les dates sans données = 0)
-            for date_obj in sorted_dates:
-                attendance = emp_data['attendances'].get(date_obj, {})
-                row_data.extend([
-                    attendance.get('present', 0),
-                    attendance.get('absent', 0),
-                    attendance.get('cong', 0),
-                    attendance.get('tour_rep', 0),
-                    attendance.get('repos_med', 0),
-                    attendance.get('sans_ph', 0)
-                ])
-            
-            # Ajouter les totaux à la fin
-            totals = employee_totals[matricule]
-            row_data.extend([
-                totals['present'],
-                totals['absent'],
-                totals['cong'],
-                totals['tour_rep'],
-                totals['repos_med'],
-                totals['sans_ph']
-            ])
-            
-            columns_data.append(row_data)
-        
-        # Construire les en-têtes complets
+        # Lignes de la feuille 1 : infos fixes, statuts date par date, totaux
+        columns_data = [
+            fixed + statuses.tolist() + emp_totals.tolist()
+            for fixed, statuses, emp_totals in zip(fixed_rows, grid.reshape(len(all_employees), -1), totals)
+        ]
+
+        status_headers = ['Présent', 'Absent', 'CONG', 'Tour_rep', 'Repos_med', 'Sans_ph']
+
+        # Construire les en-têtes complets (None = cellule couverte par une fusion)
         first_header = fixed_columns.copy()
         second_header = [''] * len(fixed_columns)
-        
-        # Compter le nombre de colonnes pour chaque date (6 statuts)
-        color_index = 0
-        
         for date_obj in sorted_dates:
-            date_str = date_obj.strftime('%d/%m/%Y')
-            first_header.extend([date_str] * 6)
-            second_header.extend(['Présent', 'Absent', 'CONG', 'Tour_rep', 'Repos_med', 'Sans_ph'])
-            color_index += 1
-        
+            first_header.extend([date_obj.strftime('%d/%m/%Y')] + [None] * 5)
+            second_header.extend(status_headers)
+
         # Ajouter les en-têtes de récapitulatif
-        first_header.extend(total_headers_first)
-        second_header.extend(total_headers_second)
-        
-        # Chemin du fichier d'export avec plage de dates
+        recap_start_col = len(first_header) + 1
+        first_header.extend(['RÉCAPITULATIF'] + [None] * 5)
+        second_header.extend(status_headers)
+
+        # Nom du fichier d'export avec plage de dates
         start_str = start.replace('-', '-') if start else datetime.now().strftime('%d-%m-%Y')
         end_str = end.replace('-', '-') if end else datetime.now().strftime('%d-%m-%Y')
-
-        out_path = os.path.join(
-            app.config['EXPORT_FOLDER'],
-            f'presence_{start_str}_a_{end_str}.xlsx'
-        )
-        
-        # Créer le fichier Excel manuellement avec openpyxl
-        workbook = openpyxl.Workbook()
+        download_name = f'presence_{start_str}_a_{end_str}.xlsx'
         
         # FEUILLE 1 : Présences détaillées (existante)
-        worksheet1 = workbook.active
-        worksheet1.title = 'Feuille1'
-        
-        # Écrire la première ligne d'en-tête (dates fusionnées)
-        col_num = 1
-        # Colonnes fixes
-        for header in fixed_columns:
-            worksheet1.cell(row=1, column=col_num, value=header)
-            col_num += 1
-        
-        # Colonnes de dates fusionnées
-        current_col = col_num
-        date_color_map = {}
-        
-        for i, date_obj in enumerate(sorted_dates):
-            date_str = date_obj.strftime('%d/%m/%Y')
-            start_col = current_col
-            end_col = current_col + 5  # 6 colonnes - 1 (index 0-based)
-            
-            # Fusionner les cellules pour la date
-            worksheet1.merge_cells(start_row=1, start_column=start_col, end_row=1, end_column=end_col)
-            
-            # Écrire la date au centre de la cellule fusionnée
-            cell = worksheet1.cell(row=1, column=start_col, value=date_str)
-            
-            # Stocker la position et la couleur pour cette date
-            date_color_map[(start_col, end_col)] = date_colors[i % len(date_colors)]
-            
-            current_col = end_col + 1
-        
-        # Colonnes de récapitulatif fusionnées
-        recap_start_col = current_col
-        recap_end_col = current_col + 5
-        worksheet1.merge_cells(start_row=1, start_column=recap_start_col, end_row=1, end_column=recap_end_col)
-        worksheet1.cell(row=1, column=recap_start_col, value='RÉCAPITULATIF')
-        
-        # Écrire la deuxième ligne d'en-tête (statuts)
-        col_num = 1
-        # Colonnes fixes (vide pour la deuxième ligne)
-        for header in fixed_columns:
-            worksheet1.cell(row=2, column=col_num, value='')
-            col_num += 1
-        
-        # Statuts pour chaque date
-        for date_obj in sorted_dates:
-            statuts = ['Présent', 'Absent', 'CONG', 'Tour_rep', 'Repos_med', 'Sans_ph']
-            for statut in statuts:
-                worksheet1.cell(row=2, column=col_num, value=statut)
-                col_num += 1
-        
-        # Statuts pour le récapitulatif
-        statuts_recap = ['Présent', 'Absent', 'CONG', 'Tour_rep', 'Repos_med', 'Sans_ph']
-        for statut in statuts_recap:
-            worksheet1.cell(row=2, column=col_num, value=statut)
-            col_num += 1
-        
-        # Écrire les données
-        for row_num, row_data in enumerate(columns_data, 3):  # Commencer à la ligne 3
-            for col_num, value in enumerate(row_data, 1):
-                worksheet1.cell(row=row_num, column=col_num, value=value)
-        
-        # Appliquer le style aux en-têtes
-        header_fill = PatternFill(start_color='D3D3D3', end_color='D3D3D3', fill_type='solid')
-        header_font = Font(bold=True, size=11)
-        thin_border = Border(
-            left=Side(style='thin'), 
-            right=Side(style='thin'), 
-            top=Side(style='thin'), 
-            bottom=Side(style='thin')
-        )
-        center_alignment = Alignment(horizontal='center', vertical='center')
-        
-        # Appliquer le style à la première ligne d'en-tête
-        for col_num in range(1, len(first_header) + 1):
-            cell = worksheet1.cell(row=1, column=col_num)
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.border = thin_border
-            cell.alignment = center_alignment
-        
-        # Appliquer le style à la deuxième ligne d'en-tête
-        for col_num in range(1, len(second_header) + 1):
-            cell = worksheet1.cell(row=2, column=col_num)
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.border = thin_border
-            cell.alignment = center_alignment
-        
-        # Appliquer les couleurs aux dates fusionnées
-        for (start_col, end_col), color_fill in date_color_map.items():
-            for col_num in range(start_col, end_col + 1):
-                cell = worksheet1.cell(row=1, column=col_num)
-                cell.fill = color_fill
-                # Appliquer aussi la couleur aux en-têtes de statuts de cette date
-                statut_cell = worksheet1.cell(row=2, column=col_num)
-                statut_cell.fill = color_fill
-        
-        # Appliquer une couleur différente pour le récapitulatif
-        recap_color = PatternFill(start_color='FFCC99', end_color='FFCC99', fill_type='solid')  # Orange clair
-        for col_num in range(recap_start_col, recap_end_col + 1):
-            cell = worksheet1.cell(row=1, column=col_num)
-            cell.fill = recap_color
-            statut_cell = worksheet1.cell(row=2, column=col_num)
-            statut_cell.fill = recap_color
-        
-        # Ajuster la largeur des colonnes automatiquement
-        for col_num in range(1, len(first_header) + 1):
-            max_length = 0
-            column_letter = get_column_letter(col_num)
-            for row_num in range(1, worksheet1.max_row + 1):
-                cell = worksheet1.cell(row=row_num, column=col_num)
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 15)
-            worksheet1.column_dimensions[column_letter].width = adjusted_width
+        # Couleur de chaque colonne d'en-tête : gris (fixes), cycle par date, orange (récap)
+        column_fills = [EXPORT_HEADER_COLOR] * len(fixed_columns)
+        for i in range(len(sorted_dates)):
+            column_fills.extend([date_colors[i % len(date_colors)]] * 6)
+        column_fills.extend([EXPORT_RECAP_COLOR] * 6)
+
+        # Fusionner les cellules de chaque date et du récapitulatif sur la première ligne
+        merges = [(0, start_col, start_col + 5) for start_col in range(len(fixed_columns), recap_start_col, 6)]
+
+        # Largeurs : seules les infos fixes sont parcourues ; les colonnes de statuts
+        # (entiers positifs) prennent la longueur de leur maximum, lue dans la grille
+        widths = _column_widths([first_header, second_header] + fixed_rows)
+        numeric_max = np.concatenate([grid.max(axis=0).ravel(), totals.max(axis=0)])
+        for i, value in enumerate(numeric_max.tolist(), len(fixed_columns)):
+            widths[i] = max(widths[i], min(len(str(value)) + 2, 15))
+
+        sheets = [{
+            'title': 'Feuille1',
+            'headers': [first_header, second_header],
+            'fills': column_fills,
+            'merges': merges,
+            'rows': columns_data,
+            'widths': widths,
+        }]
 
         # FEUILLE 2 : Calculs financiers (NOUVELLE FEUILLE)
-        worksheet2 = workbook.create_sheet(title='Calculs Financiers')
-        
         # En-têtes pour la feuille 2
         financial_headers = ['Matricule', 'Nom', 'Prénom', 'Poste', 'Site', 'Affaire', 'Classe', 'Affectation', 'Ville', 
                            'Taux Logement', 'Taux Repas', 'Jours Présent', 'Total Absences', 'Mt logt', 'Mt repas']
         
-        # Écrire les en-têtes
-        for col_num, header in enumerate(financial_headers, 1):
-            cell = worksheet2.cell(row=1, column=col_num, value=header)
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.border = thin_border
-            cell.alignment = center_alignment
-        
         # Préparer les données pour la feuille 2
         financial_data = []
         
-        for emp_data in employees_data.values():
-            matricule = emp_data['matricule']
-            totals = employee_totals[matricule]
-            
-            jours_present = totals['present']
-            total_absences = totals['absent'] + totals['cong'] + totals['tour_rep'] + totals['repos_med'] + totals['sans_ph']
-            taux_lgt = emp_data['taux_lgt']
-            taux_repas = emp_data['taux_repas']
+        for fixed, emp_totals in zip(fixed_rows, totals.tolist()):
+            present, absent, cong, tour_rep, repos_med, sans_ph = emp_totals
+
+            jours_present = present
+            total_absences = absent + cong + tour_rep + repos_med + sans_ph
+            taux_lgt = fixed[9]
+            taux_repas = fixed[10]
             
             # Calcul Mt logt selon la condition
             if total_absences > 15:
@@ -419,50 +318,27 @@ def create_app():
             # Calcul Mt repas
             mt_repas = (taux_repas * jours_present) - total_absences
             
-            financial_data.append([
-                emp_data['matricule'],
-                emp_data['nom'],
-                emp_data['prenom'],
-                emp_data['poste'],
-                emp_data['site'],
-                emp_data['affaire'],
-                emp_data['classe'],
-                emp_data['affectation'],
-                emp_data['ville'],
-                taux_lgt,
-                taux_repas,
-                jours_present,
-                total_absences,
-                mt_logt,
-                mt_repas
-            ])
-        
-        # Écrire les données financières
-        for row_num, row_data in enumerate(financial_data, 2):  # Commencer à la ligne 2
-            for col_num, value in enumerate(row_data, 1):
-                cell = worksheet2.cell(row=row_num, column=col_num, value=value)
-                cell.border = thin_border
-                if col_num >= 14:  # Colonnes Mt logt et Mt repas
-                    cell.alignment = Alignment(horizontal='right')
-        
-        # Ajuster la largeur des colonnes pour la feuille 2
-        for col_num in range(1, len(financial_headers) + 1):
-            max_length = 0
-            column_letter = get_column_letter(col_num)
-            for row_num in range(1, worksheet2.max_row + 1):
-                cell = worksheet2.cell(row=row_num, column=col_num)
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 15)
-            worksheet2.column_dimensions[column_letter].width = adjusted_width
-        
-        # Sauvegarder le fichier
-        workbook.save(out_path)
+            financial_data.append(fixed + [jours_present, total_absences, mt_logt, mt_repas])
+
+        # Bordures sur les données ; Mt logt et Mt repas alignés à droite
+        sheets.append({
+            'title': 'Calculs Financiers',
+            'headers': [financial_headers],
+            'fills': [EXPORT_HEADER_COLOR] * len(financial_headers),
+            'rows': financial_data,
+            'bordered': True,
+            'right_from': 13,
+        })
 
-        return send_file(out_path, as_attachment=True, download_name=os.path.basename(out_path))
+        # Générer le fichier en mémoire et l'envoyer directement (pas d'écriture disque)
+        buffer = _write_workbook(sheets)
+
+        return send_file(
+            buffer,
+            as_attachment=True,
+            download_name=download_name,
+            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
 
     return app
 
@@ -471,11 +347,216 @@ def create_app():
 # Fonctions utilitaires
 # -------------------------
 
+def _column_widths(rows) -> list:
+    """Largeur de chaque colonne : plus long contenu (+2), plafonnée à 15."""
+    widths = [0] * max(len(row) for row in rows)
+    for row in rows:
+        for i, value in enumerate(row):
+            length = len(str(value))
+            if length > widths[i]:
+                widths[i] = length
+    return [min(width + 2, 15) for width in widths]
+
+
+def _write_workbook(sheets) -> io.BytesIO:
+    """
+    Écrit les feuilles de l'export dans un classeur xlsx en mémoire.
+    Chaque feuille est un dict : title, headers (lignes d'en-tête), fills (couleur
+    d'en-tête de chaque colonne), rows, et en option merges ((ligne, première
+    colonne, dernière colonne), base 0), bordered (bordure des cellules de
+    données), right_from (première colonne de données alignée à droite) et
+    widths (largeurs déjà calculées, sinon déduites de toutes les lignes).
+    """
+    buffer = io.BytesIO()
+    if xlsxwriter is not None:
+        _write_workbook_xlsxwriter(buffer, sheets)
+    else:
+        _write_workbook_openpyxl(buffer, sheets)
+    buffer.seek(0)
+    return buffer
+
+
+def _write_workbook_xlsxwriter(buffer, sheets):
+    """Export via xlsxwriter en mode constant_memory : chaque ligne est écrite puis libérée."""
+    workbook = xlsxwriter.Workbook(buffer, {'constant_memory': True})
+
+    # Formats créés une seule fois et partagés par les cellules
+    header_formats = {}
+
+    def header_format(color):
+        if color not in header_formats:
+            header_formats[color] = workbook.add_format({
+                'bold': True, 'font_size': 11, 'bg_color': f'#{color}', 'pattern': 1,
+                'border': 1, 'align': 'center', 'valign': 'vcenter'
+            })
+        return header_formats[color]
+
+    data_format = workbook.add_format({'border': 1})
+    right_format = workbook.add_format({'border': 1, 'align': 'right'})
+
+    for sheet in sheets:
+        worksheet = workbook.add_worksheet(sheet['title'])
+        for i, width in enumerate(sheet.get('widths') or _column_widths(sheet['headers'] + sheet['rows'])):
+            worksheet.set_column(i, i, width)
+
+        merge_ends = {(row, first): last for row, first, last in sheet.get('merges', ())}
+        covered = {(row, col) for row, first, last in sheet.get('merges', ()) for col in range(first + 1, last + 1)}
+        for r, header in enumerate(sheet['headers']):
+            for c, (value, color) in enumerate(zip(header, sheet['fills'])):
+                if (r, c) in merge_ends:
+                    worksheet.merge_range(r, c, r, merge_ends[(r, c)], value, header_format(color))
+                elif (r, c) not in covered:
+                    worksheet.write(r, c, value, header_format(color))
+
+        right_from = sheet.get('right_from')
+        for r, row_data in enumerate(sheet['rows'], len(sheet['headers'])):
+            if sheet.get('bordered'):
+                split = right_from if right_from is not None else len(row_data)
+                worksheet.write_row(r, 0, row_data[:split], data_format)
+                worksheet.write_row(r, split, row_data[split:], right_format)
+            else:
+                worksheet.write_row(r, 0, row_data)
+
+    workbook.close()
+
+
+def _write_workbook_openpyxl(buffer, sheets):
+    """
+    Export via openpyxl en mode écriture seule (sans xlsxwriter) : les lignes
+    sont écrites au fil de l'eau, sans garder le modèle de cellules en mémoire.
+    """
+    workbook = openpyxl.Workbook(write_only=True)
+
+    # Styles partagés par toutes les cellules
+    header_font = Font(bold=True, size=11)
+    thin_border = Border(
+        left=Side(style='thin'),
+        right=Side(style='thin'),
+        top=Side(style='thin'),
+        bottom=Side(style='thin')
+    )
+    center_alignment = Alignment(horizontal='center', vertical='center')
+    right_alignment = Alignment(horizontal='right')
+    header_styles = {}
+
+    def header_cell(ws, value, color):
+        # Un style nommé par couleur d'en-tête : une seule affectation par cellule
+        if color not in header_styles:
+            style = NamedStyle(
+                name=f'entete_{color}',
+                fill=PatternFill(start_color=color, end_color=color, fill_type='solid'),
+                font=header_font,
+                border=thin_border,
+                alignment=center_alignment
+            )
+            workbook.add_named_style(style)
+            header_styles[color] = style.name
+        cell = WriteOnlyCell(ws, value=value)
+        cell.style = header_styles[color]
+        return cell
+
+    for sheet in sheets:
+        worksheet = workbook.create_sheet(title=sheet['title'])
+
+        for row, first, last in sheet.get('merges', ()):
+            worksheet.merged_cells.add(f'{get_column_letter(first + 1)}{row + 1}:{get_column_letter(last + 1)}{row + 1}')
+
+        # En écriture seule, les largeurs doivent être posées avant les lignes
+        for i, width in enumerate(sheet.get('widths') or _column_widths(sheet['headers'] + sheet['rows']), 1):
+            worksheet.column_dimensions[get_column_letter(i)].width = width
+
+        for header in sheet['headers']:
+            worksheet.append([header_cell(worksheet, value, color) for value, color in zip(header, sheet['fills'])])
+
+        right_from = sheet.get('right_from')
+        for row_data in sheet['rows']:
+            if not sheet.get('bordered'):
+                worksheet.append(row_data)
+                continue
+            cells = []
+            for col, value in enumerate(row_data):
+                cell = WriteOnlyCell(worksheet, value=value)
+                cell.border = thin_border
+                if right_from is not None and col >= right_from:
+                    cell.alignment = right_alignment
+                cells.append(cell)
+            worksheet.append(cells)
+
+    # Équivalent de workbook.save(), avec un niveau de compression réglable
+    archive = ZipFile(buffer, 'w', ZIP_DEFLATED, allowZip64=True, compresslevel=EXPORT_ZIP_LEVEL)
+    ExcelWriter(workbook, archive).save()
+
+
+@lru_cache(maxsize=None)
+def _classify_status(label) -> int:
+    """Retourne l'index dans STATUS_KEYS du statut désigné par un libellé d'en-tête (ou None)."""
+    sn = str(label).strip().lower()
+    for status_idx, alternatives in _STATUS_RULES:
+        if any(all(part in sn for part in parts) for parts in alternatives):
+            return status_idx
+    return None
+
+
+def _text_column(col: pd.Series) -> pd.Series:
+    """Cellules converties en texte sans espaces autour ; les cellules vides restent manquantes."""
+    return col.map(lambda val: str(val).strip(), na_action='ignore')
+
+
+def _truthy_mask(col: pd.Series) -> np.ndarray:
+    """
+    Indique, pour chaque cellule d'une colonne de statut, si elle est cochée
+    (nombre non nul, ou texte 'x', '1', 'oui'... / entier non nul).
+    Les cas les moins coûteux sont traités en premier.
+    """
+    if pd.api.types.is_numeric_dtype(col):
+        return col.fillna(0).ne(0).to_numpy()
+
+    mask = np.zeros(len(col), dtype=bool)
+    if col.dtype != object and not pd.api.types.is_string_dtype(col):
+        return mask
+    filled = col.notna().to_numpy()
+    if not filled.any():
+        return mask
+
+    vals = col[filled]
+    kind = pd.api.types.infer_dtype(vals, skipna=True)
+    if kind in ('integer', 'floating', 'mixed-integer-float', 'boolean', 'decimal'):
+        mask[filled] = pd.to_numeric(vals, errors='coerce').fillna(0).ne(0).to_numpy()
+        return mask
+    if kind not in ('string', 'mixed', 'mixed-integer'):
+        # dates, durées... : jamais considérées comme cochées
+        return mask
+
+    # Cellules très répétitives ('x', 'X', 'P'...) : chaque valeur distincte
+    # n'est normalisée qu'une fois, le résultat est reporté via son code
+    codes, uniques = pd.factorize(vals)
+    uniques = pd.Series(uniques, dtype=object)
+
+    # Textes : .str renvoie NaN pour les cellules non textuelles
+    low = uniques.str.strip().str.lower()
+    is_text = low.notna()
+    hit = low.isin(TRUE_STRINGS)
+
+    # Entiers écrits en texte ('2', '01'...) : testés en dernier, hors liste connue
+    rest = is_text & ~hit & low.ne('')
+    if rest.any():
+        digits = low[rest]
+        hit[rest] = digits.str.isdecimal() & digits.str.strip('0').ne('')
+
+    # Nombres mélangés à du texte dans une colonne object
+    if not is_text.all():
+        hit |= pd.to_numeric(uniques.where(~is_text), errors='coerce').fillna(0).ne(0)
+
+    mask[filled] = hit.to_numpy()[codes]
+    return mask
+
+
+@lru_cache(maxsize=4096)
 def _normalize(s: str) -> str:
-    """Normalise une chaîne pour comparaison d'en-têtes."""
+    """Normalise une chaîne pour comparaison d'en-têtes (libellés répétés : mémorisé)."""
     if s is None:
         return ''
-    return re.sub(r'[^A-Za-z0-9éèêàôùïçÉÀÈ]', '', str(s)).strip().lower()
+    return _NORM_RE.sub('', str(s)).strip().lower()
 
 
 def _is_date_string(s: str) -> bool:
@@ -483,23 +564,18 @@ def _is_date_string(s: str) -> bool:
     if not s:
         return False
     s = str(s).strip()
-    return bool(re.match(r'^\d{1,2}\/\d{1,2}\/\d{4}$', s))
+    return bool(_DATE_RE.match(s))
 
 
+@lru_cache(maxsize=4096)
 def _parse_date_flexible(date_str: str):
-    """Parse une date en essayant plusieurs formats."""
+    """
+    Parse une date en essayant plusieurs formats. Mémorisé : les libellés
+    d'en-tête se répètent et le repli pd.to_datetime est coûteux.
+    """
     date_str = str(date_str).strip()
     
-    # Formats à essayer
-    formats = [
-        '%d/%m/%Y',  # DD/MM/YYYY
-        '%m/%d/%Y',  # MM/DD/YYYY
-        '%Y-%m-%d',  # YYYY-MM-DD
-        '%d-%m-%Y',  # DD-MM-YYYY
-        '%m-%d-%Y',  # MM-DD-YYYY
-    ]
-    
-    for fmt in formats:
+    for fmt in DATE_FORMATS:
         try:
             return datetime.strptime(date_str, fmt).date()
         except ValueError:
@@ -516,24 +592,149 @@ def _parse_date_flexible(date_str: str):
     return None
 
 
-def process_upload(path: str) -> int:
+def _read_csv_grid(path: str, **kwargs) -> pd.DataFrame:
     """
-    Lit un fichier Excel avec double en-tête (header=[0,1]) où la ligne 1 contient
-    les dates (fusionnées en Excel) et la ligne 2 contient les statuts (Présent/Absent/...).
-    Insère / met à jour les attendances.
-    Retourne le nombre d'enregistrements d'attendance traités.
+    Lit un CSV sans en-tête (toutes les cellules en texte), séparateur ',' ';' ou tabulation.
+    kwargs : options read_csv supplémentaires (nrows, skiprows, usecols...).
+    """
+    with open(path, newline='', encoding='utf-8-sig', errors='replace') as fh:
+        sample = fh.read(4096)
+    try:
+        sep = csv.Sniffer().sniff(sample, delimiters=',;\t').delimiter
+    except csv.Error:
+        sep = ','
+
+    # memory_map : le parseur C lit le fichier directement depuis le cache de pages
+    options = dict(header=None, dtype=str, sep=sep, engine='c', keep_default_na=True, memory_map=True, **kwargs)
+    try:
+        return pd.read_csv(path, encoding='utf-8-sig', **options)
+    except UnicodeDecodeError:
+        # CSV enregistré par Excel sous Windows
+        return pd.read_csv(path, encoding='cp1252', **options)
+
+
+def _sheet_names(path: str) -> list:
+    """Feuilles à importer, dans l'ordre du classeur : la première (index 0) est la feuille par défaut ([None] pour un CSV)."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.csv':
+        return [None]
+    if CalamineWorkbook is not None:
+        return list(CalamineWorkbook.from_path(path).sheet_names)
+    if ext == '.xlsx':
+        wb = openpyxl.load_workbook(path, read_only=True)
+        try:
+            return [ws.title for ws in wb.worksheets]
+        finally:
+            wb.close()
+    with pd.ExcelFile(path) as xls:
+        return list(xls.sheet_names)
+
+
+def _calamine_value(val):
+    """Aligne une valeur lue par calamine sur openpyxl : cellule vide -> None, 12.0 -> 12."""
+    if val == '':
+        return None
+    if type(val) is float and val.is_integer():
+        return int(val)
+    return val
+
+
+def _row_picker(positions):
+    """Fonction renvoyant, sous forme de tuple, les valeurs d'une ligne aux positions données."""
+    if len(positions) == 1:
+        pos = positions[0]
+        return lambda row: (row[pos],)
+    if not positions:
+        return lambda row: ()
+    return itemgetter(*positions)
+
+
+def _read_upload(path: str, sheet=None, usecols=None):
+    """
+    Lit une feuille du fichier importé (par défaut la première).
+    Retourne (en-têtes, df) : la liste des couples (ligne 1, ligne 2) de chaque
+    colonne, et un DataFrame des lignes suivantes dont les colonnes sont nommées
+    par leur position dans le fichier.
+    usecols : fonction (en-têtes) -> positions des colonnes à garder dans df.
     """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.csv':
+        # Parseur C de pandas : nettement plus rapide que la lecture d'un classeur
+        head = _read_csv_grid(path, nrows=2)
+        width = head.shape[1]
+        header_rows = [[None if pd.isna(v) else v for v in head.iloc[i]] if i < len(head) else [None] * width
+                       for i in (0, 1)]
+        headers = list(zip(*header_rows))
+        positions = usecols(headers) if usecols is not None else list(range(width))
+        try:
+            df = _read_csv_grid(path, skiprows=2, usecols=positions)
+        except pd.errors.EmptyDataError:
+            # fichier réduit aux deux lignes d'en-tête
+            df = pd.DataFrame(columns=positions, dtype=object)
+        return headers, df
+
+    if CalamineWorkbook is not None:
+        # Analyse du classeur (.xlsx / .xls) par calamine, nettement plus rapide ;
+        # skip_empty_area=False conserve les positions de colonnes du fichier
+        wb = CalamineWorkbook.from_path(path)
+        ws = wb.get_sheet_by_name(sheet) if sheet is not None else wb.get_sheet_by_index(0)
+        rows = ws.to_python(skip_empty_area=False)
+        width = max((len(row) for row in rows[:2]), default=0)
+        header_rows = [tuple(_calamine_value(v) for v in row) + (None,) * (width - len(row)) for row in rows[:2]]
+        header_rows += [(None,) * width] * (2 - len(header_rows))
+        headers = list(zip(*header_rows))
+
+        positions = usecols(headers) if usecols is not None else list(range(width))
+        pick = _row_picker(positions)
+        data = [tuple(_calamine_value(v) for v in pick(row)) for row in rows[2:]]
+        return headers, pd.DataFrame(data, columns=positions, dtype=object)
+
+    if ext == '.xlsx':
+        # Lecture en flux (read_only) : pas de modèle de cellules en mémoire
+        wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            ws = wb[sheet] if sheet is not None else wb.worksheets[0]
+            rows_iter = ws.iter_rows(values_only=True)
+            first = next(rows_iter, ())
+            second = next(rows_iter, ())
+            width = max(len(first), len(second))
+            first = first + (None,) * (width - len(first))
+            second = second + (None,) * (width - len(second))
+            headers = list(zip(first, second))
+
+            positions = usecols(headers) if usecols is not None else list(range(width))
+            pick = _row_picker(positions)
+            data = []
+            for row in rows_iter:
+                if len(row) < width:
+                    row = row + (None,) * (width - len(row))
+                data.append(pick(row))
+        finally:
+            wb.close()
+
+        return headers, pd.DataFrame(data, columns=positions, dtype=object)
+
     # Lecture en header multi-index
     try:
-        df = pd.read_excel(path, header=[0, 1], engine='openpyxl')
+        df = pd.read_excel(path, sheet_name=sheet or 0, header=[0, 1])
     except Exception as e:
         print(f"DEBUG: Error reading with multi-index: {e}")
         # fallback : lecture simple
-        df = pd.read_excel(path, engine='openpyxl')
+        df = pd.read_excel(path, sheet_name=sheet or 0)
 
-    # Convertir tuples en listes manipulables
-    cols = list(df.columns)
+    headers = [col if isinstance(col, tuple) else (col, '') for col in df.columns]
+    df.columns = range(len(headers))
+    if usecols is not None:
+        df = df[usecols(headers)]
+    return headers, df
 
+
+def _map_columns(cols):
+    """
+    Analyse les couples d'en-têtes (ligne 1, ligne 2) d'une feuille.
+    Retourne (fixed_map, date_columns) : canon -> position pour les informations
+    fixes, et date -> {index de statut: [positions]} pour les colonnes datées.
+    """
     # normaliser tous les éléments en str et forward-fill le niveau "top" si vide
     top_level = []
     bottom_level = []
@@ -549,39 +750,23 @@ def process_upload(path: str) -> int:
         top_level.append(a_s)
         bottom_level.append(b_s)
 
-    # rebuild MultiIndex labels as tuples (top, bottom)
+    # rebuild labels as tuples (top, bottom)
     new_cols = [(top_level[i], bottom_level[i]) for i in range(len(top_level))]
-    df.columns = pd.MultiIndex.from_tuples(new_cols)
-
-    # canonical fixed columns and variants
-    canonical_fixed = {
-        'matricule': ['matricule', 'id'],
-        'nom': ['nom', 'name'],
-        'prenom': ['prenom', 'prénom', 'prenom'],
-        'poste': ['poste', 'position'],
-        'site': ['site'],
-        'affaire': ['affaire'],
-        'classe': ['classe', 'class', 'niveau'],
-        'affectation': ['affectation', 'affect', 'assignment'],
-        'ville': ['ville', 'city'],
-        'taux_logement': ['tauxlogement', 'taux_logement', 'taux_lgt', 'taux logement', 'tauxlgt'],
-        'taux_repas': ['tauxrepas', 'taux_repas', 'taux repas', 'tauxrep']
-    }
 
     # find fixed columns (they may be in top or bottom depending on how template was made)
+    # fixed_map / date_columns référencent les colonnes par position entière ;
+    # à égalité, la colonne canonique déclarée en premier l'emporte
     fixed_map = {}
-    for col in df.columns:
+    for pos, col in enumerate(new_cols):
         top, bot = col
-        top_n = _normalize(top)
-        bot_n = _normalize(bot)
-        for canon, variants in canonical_fixed.items():
-            if top_n in variants or bot_n in variants:
-                fixed_map[canon] = col
-                break
-
-    # Build date_columns: mapping date_str -> {status_label: column_tuple}
+        hits = [_FIXED_VARIANTS[n] for n in (_normalize(top), _normalize(bot)) if n in _FIXED_VARIANTS]
+        if hits:
+            fixed_map[min(hits)[1]] = pos
+
+    # Build date_columns: mapping date -> {status_index: [column_positions]}
+    # (la date et le libellé du statut sont analysés une seule fois, ici)
     date_columns = {}
-    for col in df.columns:
+    for pos, col in enumerate(new_cols):
         top, bot = col
         # Essayer de parser la date avec plusieurs formats
         date_candidate = None
@@ -595,142 +780,173 @@ def process_upload(path: str) -> int:
                     break
         
         if date_candidate:
-            date_str = date_candidate.strftime('%Y-%m-%d')  # Stocker en format standard
-            status = str(status_candidate).strip() if status_candidate else ''
-            date_columns.setdefault(date_str, {})[status] = col
+            status_idx = _classify_status(status_candidate or '')
+            status_map = date_columns.setdefault(date_candidate, {})
+            if status_idx is not None:
+                status_map.setdefault(status_idx, []).append(pos)
 
-    print(f"DEBUG: Found {len(date_columns)} date columns in import file: {list(date_columns.keys())}")
+    return fixed_map, date_columns
 
-    rows_processed = 0
 
-    # DB transaction: we'll commit at end (explicitly)
-    try:
-        for idx, row in df.iterrows():
-            # 1. Identification de l'employé par Matricule
-            matricule = None
-            if 'matricule' in fixed_map:
-                matricule = row[fixed_map['matricule']]
-            else:
-                # Heuristique de secours: prendre la première colonne
-                matricule = row[df.columns[0]]
+def _useful_columns(cols) -> list:
+    """Positions des colonnes lues par l'import : informations fixes, matricule et statuts datés."""
+    fixed_map, date_columns = _map_columns(cols)
+    positions = set(fixed_map.values())
+    positions.add(fixed_map.get('matricule', 0))
+    for status_map in date_columns.values():
+        for col_positions in status_map.values():
+            positions.update(col_positions)
+    return sorted(pos for pos in positions if pos < len(cols))
 
-            if pd.isna(matricule):
-                continue
-            matricule = str(matricule).strip()
-            if not matricule:
-                continue
 
-            # find or create employee
-            emp = Employee.query.filter_by(matricule=matricule).first()
-            if not emp:
-                emp = Employee(matricule=matricule)
-                db.session.add(emp)
-                db.session.flush()
-
-            # 2. Mise à jour des informations fixes de l'employé
-            for key in ('nom', 'prenom', 'poste', 'site', 'affaire', 'classe', 'affectation', 'ville'):
-                if key in fixed_map:
-                    val = row[fixed_map[key]]
-                    if pd.notna(val):
-                        try:
-                            setattr(emp, key, str(val).strip())
-                        except Exception:
-                            pass
-
-            # Mise à jour des taux (logement / repas)
-            if 'taux_logement' in fixed_map:
+def _parse_sheet(args):
+    """
+    Analyse une feuille (path, nom de feuille) sans accès à la base ; fonction de
+    niveau module pour pouvoir s'exécuter dans un processus séparé.
+    Retourne (nombre de dates ayant au moins un statut reconnu, [(matricule, infos fixes)],
+    [(matricule, date, statuts)]).
+    """
+    path, sheet = args
+    # Lecture : couples d'en-têtes (ligne 1, ligne 2) + lignes de données par position
+    # seules les colonnes exploitées sont conservées (notes, commentaires... ignorés)
+    cols, df = _read_upload(path, sheet, usecols=_useful_columns)
+
+    fixed_map, date_columns = _map_columns(cols)
+    print(f"DEBUG: Found {len(date_columns)} date columns in import file: {[d.isoformat() for d in date_columns]}")
+
+    # Lecture des lignes du fichier
+    # Statuts : chaque colonne, déjà classée d'après son libellé,
+    # est évaluée d'un bloc (une passe vectorisée par colonne)
+    date_flags = []
+    for date_obj, status_map in date_columns.items():
+        flags_block = np.zeros((len(df), len(STATUS_KEYS)), dtype=np.int8)
+        for status_idx, positions in status_map.items():
+            for col_pos in positions:
+                flags_block[:, status_idx] |= _truthy_mask(df[col_pos])
+
+        # skip rows with no status flagged for this date
+        flagged = flags_block.any(axis=1)
+        if flagged.any():
+            date_flags.append((date_obj, flags_block, flagged))
+
+    # Identification de l'employé par Matricule, colonne entière d'un bloc
+    # (heuristique de secours pour le matricule: prendre la première colonne)
+    matricule_pos = fixed_map.get('matricule', 0)
+    status_dates = sum(1 for status_map in date_columns.values() if status_map)
+    if matricule_pos not in df.columns:
+        return status_dates, [], []
+    matricules = _text_column(df[matricule_pos])
+    valid = (matricules.notna() & matricules.ne('')).to_numpy()
+    mat_values = matricules.to_numpy(dtype=object)
+
+    # Informations fixes de l'employé : (clé, valeurs, cellule renseignée)
+    text_values = [(key, _text_column(df[fixed_map[key]]).to_numpy(dtype=object), df[fixed_map[key]].notna().to_numpy())
+                   for key in ('nom', 'prenom', 'poste', 'site', 'affaire', 'classe', 'affectation', 'ville')
+                   if key in fixed_map]
+    taux_values = [(attr, df[fixed_map[key]].to_numpy(dtype=object), df[fixed_map[key]].notna().to_numpy())
+                   for key, attr in TAUX_ATTRS.items() if key in fixed_map]
+
+    employees = []
+    for pos in np.flatnonzero(valid):
+        fixed_values = {key: values[pos] for key, values, present in text_values if present[pos]}
+
+        # Taux (logement / repas)
+        for attr, values, present in taux_values:
+            if present[pos]:
                 try:
-                    val = row[fixed_map['taux_logement']]
-                    if pd.notna(val):
-                        emp.taux_lgt = float(val)
-                except Exception:
+                    fixed_values[attr] = float(values[pos])
+                except (TypeError, ValueError):
                     # ignore bad conversion
                     pass
-            if 'taux_repas' in fixed_map:
-                try:
-                    val = row[fixed_map['taux_repas']]
-                    if pd.notna(val):
-                        emp.taux_repas = float(val)
-                except Exception:
-                    pass
 
-            # 3. Parcours des dates et statuts (le cœur de l'import)
-            for date_str, status_map in date_columns.items():
-                try:
-                    # date_str est déjà au format YYYY-MM-DD
-                    date_obj = datetime.strptime(date_str, '%Y-%m-%d').date()
-                except Exception:
-                    # if parse fails skip this date
-                    continue
-
-                # status flags
-                present_flag = 0
-                absent_flag = 0
-                cong_flag = 0
-                tourrep_flag = 0
-                repos_flag = 0
-                sansph_flag = 0
-
-                def cell_true(val):
-                    if pd.isna(val):
-                        return False
-                    if isinstance(val, (int, float)):
-                        return val != 0
-                    s = str(val).strip().lower()
-                    if not s:
-                        return False
-                    return s in ('x', '1', 'yes', 'y', 'présent', 'present', 'p') or (s.isdigit() and int(s) != 0)
-
-                # read each status cell for the date
-                for status_label, colkey in status_map.items():
-                    try:
-                        sval = row[colkey]
-                        if cell_true(sval):
-                            sn = str(status_label).strip().lower()
-                            if 'prés' in sn or 'present' in sn:
-                                present_flag = 1
-                            elif 'abs' in sn:
-                                absent_flag = 1
-                            elif 'cong' in sn:
-                                cong_flag = 1
-                            elif 'tour' in sn and 'rep' in sn:
-                                tourrep_flag = 1
-                            elif 'repos' in sn or 'méd' in sn or 'med' in sn:
-                                repos_flag = 1
-                            elif 'sans' in sn and 'ph' in sn:
-                                sansph_flag = 1
-                    except Exception:
-                        pass
-
-                # skip if no status flagged
-                if (present_flag + absent_flag + cong_flag + tourrep_flag + repos_flag + sansph_flag) == 0:
-                    continue
-
-                # upsert attendance row (employee_id + date)
-                att = Attendance.query.filter_by(employee_id=emp.id, date=date_obj).first()
-                if not att:
-                    att = Attendance(
-                        employee_id=emp.id,
-                        date=date_obj,
-                        present=present_flag,
-                        absent=absent_flag,
-                        cong=cong_flag,
-                        tour_rep=tourrep_flag,
-                        repos_med=repos_flag,
-                        sans_ph=sansph_flag
-                    )
-                    db.session.add(att)
-                else:
-                    # replace with new values (user imports explicit statuses)
-                    att.present = present_flag
-                    att.absent = absent_flag
-                    att.cong = cong_flag
-                    att.tour_rep = tourrep_flag
-                    att.repos_med = repos_flag
-                    att.sans_ph = sansph_flag
-
-                rows_processed += 1
+        employees.append((mat_values[pos], fixed_values))
+
+    # Statuts au format long : une entrée par (ligne, date) cochée, dans l'ordre du fichier
+    records = []
+    if date_flags:
+        dates = [date_obj for date_obj, _, _ in date_flags]
+        blocks = np.stack([flags_block for _, flags_block, _ in date_flags])
+        flagged = np.stack([flagged for _, _, flagged in date_flags]) & valid
+        row_idx, date_idx = np.nonzero(flagged.T)
+        records = list(zip(
+            mat_values[row_idx].tolist(),
+            [dates[d] for d in date_idx.tolist()],
+            blocks[date_idx, row_idx].tolist()
+        ))
+
+    return status_dates, employees, records
+
+
+def process_upload(path: str) -> int:
+    """
+    Lit un fichier Excel avec double en-tête (header=[0,1]) où la ligne 1 contient
+    les dates (fusionnées en Excel) et la ligne 2 contient les statuts (Présent/Absent/...).
+    Insère / met à jour les attendances.
+    Retourne le nombre d'enregistrements d'attendance traités.
+    """
+    sheets = _sheet_names(path)
+    if len(sheets) > 1:
+        # Classeur mensuel : une feuille par processus, la base n'est écrite qu'ici.
+        # 'spawn' : pas de fork d'un serveur multithread qui tient des connexions ouvertes
+        workers = min(len(sheets), os.cpu_count() or 1, PARSE_MAX_WORKERS)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            results = list(executor.map(_parse_sheet, [(path, name) for name in sheets]))
+        # la première feuille est toujours importée, les autres seulement si ce sont des
+        # feuilles de présence : un montant ('5000') se lit comme une année, une date sans
+        # statut reconnu ne suffit donc pas (infos fixes des autres feuilles ignorées)
+        results = results[:1] + [res for res in results[1:] if res[2] or res[0]]
+    else:
+        results = [_parse_sheet((path, None))]
+
+    employees = [emp for _, emps, _ in results for emp in emps]
+    records = [rec for _, _, recs in results for rec in recs]
+
+    # DB transaction: we'll commit at end (explicitly)
+    with _bulk_import_settings():
+        return _import_rows(employees, records)
 
+
+def _import_rows(employees, records) -> int:
+    """Écrit en base les employés et présences lus par _parse_sheet, en une seule transaction."""
+    rows_processed = 0
+    try:
+        # 1. Employés : un seul SELECT ... IN, puis un seul flush pour les nouveaux
+        matricules = list(dict.fromkeys(m for m, _ in employees))
+        emp_by_mat = Employee.load_matricule_map(db.session, matricules, chunk_size=IN_CHUNK_SIZE)
+
+        # Nouveaux matricules dédoublonnés sans casse ni accents ('M001' / 'm001' :
+        # un seul employé, sous la première graphie du fichier)
+        new_by_key = {}
+        for m in matricules:
+            if m not in emp_by_mat:
+                key = matricule_key(m)
+                if key not in new_by_key:
+                    new_by_key[key] = Employee(matricule=m)
+                emp_by_mat[m] = new_by_key[key]
+        if new_by_key:
+            db.session.add_all(new_by_key.values())
+            db.session.flush()
+
+        # Mise à jour des informations fixes et des statuts (la dernière ligne du fichier l'emporte)
+        for matricule, fixed_values in employees:
+            emp = emp_by_mat[matricule]
+            for key, val in fixed_values.items():
+                setattr(emp, key, val)
+
+        staged = {}
+        for matricule, date_obj, flags in records:
+            staged[(emp_by_mat[matricule].id, date_obj)] = flags
+        rows_processed = len(records)
+
+        # 2. Insertion / remplacement des présences (la contrainte unique
+        # _emp_date_uc sur (employee_id, date) sert d'index pour l'UPSERT)
+        Attendance.bulk_upsert(db.session, [
+            dict(zip(STATUS_KEYS, flags), employee_id=emp_id, date=date_obj)
+            for (emp_id, date_obj), flags in staged.items()
+        ], batch_size=UPSERT_BATCH_SIZE)
+
+        # invalide les récapitulatifs en cache de tous les processus au commit
+        DataVersion.bump(db.session)
         db.session.commit()
         print(f"DEBUG: Successfully processed {rows_processed} attendance records")
     except Exception as e:
@@ -740,12 +956,66 @@ def process_upload(path: str) -> int:
     return rows_processed
 
 
-def build_recap(start_date=None, end_date=None):
+@contextmanager
+def _bulk_import_settings():
+    """
+    SQLite : journal en mémoire et pas de fsync pendant l'import (une seule
+    transaction). Les réglages d'origine sont rétablis par _restore_import_pragmas
+    au retour de la connexion dans le pool, avant toute autre requête.
+    """
+    engine = db.session.get_bind()
+    if engine.dialect.name != 'sqlite':
+        yield
+        return
+
+    if not event.contains(engine, 'checkin', _restore_import_pragmas):
+        event.listen(engine, 'checkin', _restore_import_pragmas)
+
+    conn = db.session.connection().connection
+    raw = conn.dbapi_connection
+    conn.info['import_pragmas'] = {name: raw.execute(f'PRAGMA {name}').fetchone()[0]
+                                   for name in ('synchronous', 'journal_mode')}
+    raw.execute('PRAGMA synchronous=OFF')
+    raw.execute('PRAGMA journal_mode=MEMORY')
+    yield
+
+
+def _restore_import_pragmas(dbapi_connection, connection_record):
+    """Pool checkin : remet les PRAGMA d'avant l'import (transaction déjà terminée)."""
+    previous = connection_record.info.pop('import_pragmas', None)
+    if previous and dbapi_connection is not None:
+        for name, value in previous.items():
+            dbapi_connection.execute(f'PRAGMA {name}={value}')
+
+
+def _recap_token():
     """
-    Retourne un DataFrame récapitulatif par employé (totaux) pour la plage fournie (inclusive).
-    Colonnes : Matricule, Nom, Prénom, Poste, Site, Affaire, Classe, Affectation, Ville,
-              Présent, Absent, CONG, Tour_rep, Repos_med, Sans_ph
+    Jeton de fraîcheur du cache : la version des données stockée en base,
+    incrémentée par chaque import (y compris une simple mise à jour), et donc
+    la même pour tous les processus du serveur.
     """
+    return DataVersion.current(db.session)
+
+
+@lru_cache(maxsize=64)
+def _render_recap(start_date, end_date, token):
+    """
+    Tableau HTML du récapitulatif, mémorisé par (plage, jeton) : tant que les
+    données ne changent pas, la page d'accueil ne refait pas le rendu.
+    """
+    # Lignes SQL passées telles quelles au template (ni DataFrame, ni to_html)
+    n_text = len(RECAP_TEXT_COLUMNS)
+    rows = [
+        [value or '' for value in row[:n_text]] + [int(value or 0) for value in row[n_text:]]
+        for row in db.session.execute(_recap_query(start_date, end_date).statement)
+    ]
+    return render_template('_recap_table.html',
+                           headers=list(RECAP_TEXT_COLUMNS.values()) + RECAP_STATUS_COLUMNS,
+                           rows=rows)
+
+
+def _recap_query(start_date=None, end_date=None):
+    """Requête des totaux par employé pour la plage fournie (inclusive)."""
     q = Attendance.query.join(Employee)
 
     if start_date:
@@ -754,7 +1024,7 @@ def build_recap(start_date=None, end_date=None):
         q = q.filter(Attendance.date <= end_date)
 
     # Aggregation par employé
-    q = q.with_entities(
+    return q.with_entities(
         Employee.matricule,
         Employee.nom,
         Employee.prenom,
@@ -774,33 +1044,6 @@ def build_recap(start_date=None, end_date=None):
                Employee.site, Employee.affaire, Employee.classe, Employee.affectation, Employee.ville
     ).order_by(Employee.matricule.asc())
 
-    rows = q.all()
-    if not rows:
-        return pd.DataFrame()
-
-    data = []
-    for r in rows:
-        data.append({
-            'Matricule': r[0],
-            'Nom': r[1] or '',
-            'Prénom': r[2] or '',
-            'Poste': r[3] or '',
-            'Site': r[4] or '',
-            'Affaire': r[5] or '',
-            'Classe': r[6] or '',
-            'Affectation': r[7] or '',
-            'Ville': r[8] or '',
-            'Présent': int(r[9] or 0),
-            'Absent': int(r[10] or 0),
-            'CONG': int(r[11] or 0),
-            'Tour_rep': int(r[12] or 0),
-            'Repos_med': int(r[13] or 0),
-            'Sans_ph': int(r[14] or 0)
-        })
-
-    df = pd.DataFrame(data)
-    return df
-
 
 if __name__ == '__main__':
     app = create_app()
@@ -6,8 +6,8 @@ basedir = os.path.abspath(os.path.dirname(__file__))
 
 SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL")  
 SQLALCHEMY_TRACK_MODIFICATIONS = False
+# Cache des requêtes compilées (500 par défaut) : les requêtes répétées ne sont pas recompilées
+SQLALCHEMY_ENGINE_OPTIONS = {'query_cache_size': 1200}
 SECRET_KEY = os.environ.get('SECRET_KEY', 'dev-secret-key')
 UPLOAD_FOLDER = os.path.join(basedir, 'uploads')
-EXPORT_FOLDER = os.path.join(basedir, 'exports')
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-os.makedirs(EXPORT_FOLDER, exist_ok=True)
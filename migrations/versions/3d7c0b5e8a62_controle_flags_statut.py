@@ -0,0 +1,31 @@
+"""controle_flags_statut
+
+Revision ID: 3d7c0b5e8a62
+Revises: e4a81c5d9f20
+Create Date: 2026-10-15 15:08:52.904417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3d7c0b5e8a62'
+down_revision = 'e4a81c5d9f20'
+branch_labels = None
+depends_on = None
+
+STATUS_COLUMNS = ('present', 'absent', 'cong', 'tour_rep', 'repos_med', 'sans_ph')
+
+
+def upgrade():
+    # Indicateurs de statut limités à 0/1
+    with op.batch_alter_table('attendances', schema=None) as batch_op:
+        for name in STATUS_COLUMNS:
+            batch_op.create_check_constraint(f'ck_attendances_{name}_flag', sa.text(f'{name} IN (0, 1)'))
+
+
+def downgrade():
+    with op.batch_alter_table('attendances', schema=None) as batch_op:
+        for name in STATUS_COLUMNS:
+            batch_op.drop_constraint(f'ck_attendances_{name}_flag', type_='check')
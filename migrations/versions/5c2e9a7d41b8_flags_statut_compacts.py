@@ -0,0 +1,38 @@
+"""flags_statut_compacts
+
+Revision ID: 5c2e9a7d41b8
+Revises: 70a23331f226
+Create Date: 2026-10-15 09:12:44.318205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision = '5c2e9a7d41b8'
+down_revision = '70a23331f226'
+branch_labels = None
+depends_on = None
+
+STATUS_COLUMNS = ('present', 'absent', 'cong', 'tour_rep', 'repos_med', 'sans_ph')
+
+
+def upgrade():
+    # Indicateurs 0/1 : TINYINT (1 octet) sous MySQL au lieu d'INTEGER (4 octets)
+    with op.batch_alter_table('attendances', schema=None) as batch_op:
+        for name in STATUS_COLUMNS:
+            batch_op.alter_column(name,
+                                  existing_type=sa.Integer(),
+                                  type_=sa.SmallInteger().with_variant(mysql.TINYINT(), 'mysql'),
+                                  existing_nullable=True)
+
+
+def downgrade():
+    with op.batch_alter_table('attendances', schema=None) as batch_op:
+        for name in STATUS_COLUMNS:
+            batch_op.alter_column(name,
+                                  existing_type=sa.SmallInteger().with_variant(mysql.TINYINT(), 'mysql'),
+                                  type_=sa.Integer(),
+                                  existing_nullable=True)
@@ -0,0 +1,30 @@
+"""version_des_donnees
+
+Revision ID: 7f2d4b9c6e15
+Revises: 3d7c0b5e8a62
+Create Date: 2026-10-15 17:26:41.093518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7f2d4b9c6e15'
+down_revision = '3d7c0b5e8a62'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Version des données (ligne unique) : jeton du cache du récapitulatif
+    data_version = op.create_table('data_version',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.bulk_insert(data_version, [{'id': 1, 'version': 0}])
+
+
+def downgrade():
+    op.drop_table('data_version')
@@ -0,0 +1,41 @@
+"""presences_suppression_cascade
+
+Revision ID: 9b3f6e2a1c47
+Revises: 5c2e9a7d41b8
+Create Date: 2026-10-15 14:03:27.551902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b3f6e2a1c47'
+down_revision = '5c2e9a7d41b8'
+branch_labels = None
+depends_on = None
+
+FK_NAME = 'fk_attendances_employee_id_employees'
+# Nom donné à la clé étrangère lorsqu'elle n'en a pas (SQLite)
+NAMING_CONVENTION = {'fk': 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s'}
+
+
+def _replace_employee_fk(ondelete):
+    """Recrée la clé étrangère attendances.employee_id -> employees.id avec l'option ondelete."""
+    inspector = sa.inspect(op.get_bind())
+    current = next(fk['name'] for fk in inspector.get_foreign_keys('attendances')
+                   if fk['referred_table'] == 'employees')
+
+    with op.batch_alter_table('attendances', schema=None,
+                              naming_convention=NAMING_CONVENTION) as batch_op:
+        batch_op.drop_constraint(current or FK_NAME, type_='foreignkey')
+        batch_op.create_foreign_key(FK_NAME, 'employees', ['employee_id'], ['id'], ondelete=ondelete)
+
+
+def upgrade():
+    # Suppression d'un employé : les présences sont supprimées par le SGBD
+    _replace_employee_fk('CASCADE')
+
+
+def downgrade():
+    _replace_employee_fk(None)
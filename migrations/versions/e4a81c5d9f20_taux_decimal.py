@@ -0,0 +1,37 @@
+"""taux_decimal
+
+Revision ID: e4a81c5d9f20
+Revises: 9b3f6e2a1c47
+Create Date: 2026-10-15 14:41:08.216734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4a81c5d9f20'
+down_revision = '9b3f6e2a1c47'
+branch_labels = None
+depends_on = None
+
+RATE_COLUMNS = ('taux_lgt', 'taux_repas')
+
+
+def upgrade():
+    # Taux : DECIMAL(12, 2) exact au lieu d'un flottant double précision
+    with op.batch_alter_table('employees', schema=None) as batch_op:
+        for name in RATE_COLUMNS:
+            batch_op.alter_column(name,
+                                  existing_type=sa.Float(),
+                                  type_=sa.Numeric(12, 2),
+                                  existing_nullable=True)
+
+
+def downgrade():
+    with op.batch_alter_table('employees', schema=None) as batch_op:
+        for name in RATE_COLUMNS:
+            batch_op.alter_column(name,
+                                  existing_type=sa.Numeric(12, 2),
+                                  type_=sa.Float(),
+                                  existing_nullable=True)
@@ -1,8 +1,28 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects import mysql
+from sqlalchemy.orm import deferred, raiseload
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from datetime import date
+import unicodedata
 
 db = SQLAlchemy()
 
+# Indicateur de statut 0/1 : TINYINT (1 octet) sous MySQL, SMALLINT ailleurs
+StatusFlag = db.SmallInteger().with_variant(mysql.TINYINT(), 'mysql')
+# Taux (montants) : DECIMAL(12, 2) en base, float côté Python
+Rate = db.Numeric(12, 2, asdecimal=False)
+# Statuts d'une journée, dans l'ordre des colonnes Attendance
+STATUS_KEYS = ('present', 'absent', 'cong', 'tour_rep', 'repos_med', 'sans_ph')
+
+def matricule_key(matricule):
+    """Forme de comparaison d'un matricule, sans casse ni accents (comme la collation MySQL)."""
+    decomposed = unicodedata.normalize('NFKD', matricule)
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold()
+
 class Employee(db.Model):
     __tablename__ = 'employees'
     id = db.Column(db.Integer, primary_key=True)
@@ -15,30 +35,175 @@ class Employee(db.Model):
     classe = db.Column(db.String(50))
     affectation = db.Column(db.String(100))
     ville = db.Column(db.String(100))
-    taux_lgt = db.Column(db.Float, default=0.0)   
-    taux_repas = db.Column(db.Float, default=0.0) 
+    # Taux différés (groupe 'taux') : chargés à la première lecture, ou avec undefer_group('taux').
+    # Stockés en DECIMAL exact (montants), relus en float comme avant
+    taux_lgt = deferred(db.Column(Rate, default=0.0), group='taux')
+    taux_repas = deferred(db.Column(Rate, default=0.0), group='taux')
+
+    # Chargement paresseux explicite : les listes d'employés (import, export) ne lisent
+    # jamais les présences par cette relation ; passer selectinload() au besoin.
+    # passive_deletes : la suppression des présences est laissée au ON DELETE CASCADE
+    attendances = db.relationship('Attendance', back_populates='employee', cascade='all, delete-orphan',
+                                  lazy='select', passive_deletes=True)
+
+    @classmethod
+    def load_matricule_map(cls, session, matricules, chunk_size=500):
+        """
+        Employés existants pour une liste de matricules, en dict matricule demandé -> Employee,
+        avec un SELECT ... IN par lot de chunk_size (au lieu d'une requête par ligne).
+        La collation MySQL ignore la casse et les accents : 'm001' y trouve la ligne 'M001'.
+        Chaque matricule est donc associé à la ligne identique, sinon à celle de même
+        matricule_key() parmi les lignes renvoyées.
+        """
+        matricules = list(matricules)
+        rows = []
+        for start in range(0, len(matricules), chunk_size):
+            # raiseload : les présences ne doivent jamais être chargées ici
+            q = select(cls).options(raiseload(cls.attendances)).where(
+                cls.matricule.in_(matricules[start:start + chunk_size])
+            )
+            rows.extend(session.scalars(q))
+
+        exact = {emp.matricule: emp for emp in rows}
+        loose = {}
+        for emp in rows:
+            loose.setdefault(matricule_key(emp.matricule), emp)
 
-    attendances = db.relationship('Attendance', back_populates='employee', cascade='all, delete-orphan')
+        found = {}
+        for matricule in matricules:
+            emp = exact.get(matricule) or loose.get(matricule_key(matricule))
+            if emp is not None:
+                found[matricule] = emp
+        return found
 
     def __repr__(self):
-        return f"<Employee {self.matricule} {self.nom}>"
+        # Lecture de l'état déjà chargé uniquement : repr() ne déclenche jamais de SELECT
+        state = self.__dict__
+        return f"<Employee {state.get('matricule', '?')} {state.get('nom', '?')}>"
 
 class Attendance(db.Model):
     __tablename__ = 'attendances'
     id = db.Column(db.Integer, primary_key=True)
-    employee_id = db.Column(db.Integer, db.ForeignKey('employees.id'), nullable=False)
+    employee_id = db.Column(db.Integer, db.ForeignKey('employees.id', ondelete='CASCADE'), nullable=False)
     date = db.Column(db.Date, nullable=False, index=True)
 
-    present = db.Column(db.Integer, default=0)
-    absent = db.Column(db.Integer, default=0)
-    cong = db.Column(db.Integer, default=0)
-    tour_rep = db.Column(db.Integer, default=0)
-    repos_med = db.Column(db.Integer, default=0)
-    sans_ph = db.Column(db.Integer, default=0)
+    present = db.Column(StatusFlag, default=0)
+    absent = db.Column(StatusFlag, default=0)
+    cong = db.Column(StatusFlag, default=0)
+    tour_rep = db.Column(StatusFlag, default=0)
+    repos_med = db.Column(StatusFlag, default=0)
+    sans_ph = db.Column(StatusFlag, default=0)
+
+    # Plusieurs-à-un : l'employé est lu dans la même requête (pas de N+1)
+    employee = db.relationship('Employee', back_populates='attendances', lazy='joined')
+
+    __table_args__ = (
+        db.UniqueConstraint('employee_id', 'date', name='_emp_date_uc'),
+        # Statuts 0/1 (NULL toléré pour les lignes anciennes)
+        *(db.CheckConstraint(f'{key} IN (0, 1)', name=f'ck_attendances_{key}_flag') for key in STATUS_KEYS),
+    )
+
+    @classmethod
+    def bulk_upsert(cls, session, rows, batch_size=500):
+        """
+        Insère les présences (dicts employee_id, date, statuts) ou remplace leurs
+        statuts si le couple (employee_id, date) existe déjà, par lots, via l'UPSERT
+        natif du SGBD : une seule instruction, exécutée en executemany par lot.
+        Ne valide pas la transaction.
+        """
+        table = cls.__table__
+        dialect = session.get_bind().dialect.name
+
+        if dialect == 'mysql':
+            stmt = mysql_insert(table)
+            stmt = stmt.on_duplicate_key_update({key: stmt.inserted[key] for key in STATUS_KEYS})
+        elif dialect in ('sqlite', 'postgresql'):
+            insert_fn = sqlite_insert if dialect == 'sqlite' else pg_insert
+            stmt = insert_fn(table)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['employee_id', 'date'],
+                set_={key: stmt.excluded[key] for key in STATUS_KEYS}
+            )
+        else:
+            stmt = None
+
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            if stmt is None:
+                cls._bulk_upsert_select_first(session, batch)
+            else:
+                session.execute(stmt, batch)
+
+    @classmethod
+    def monthly_totals(cls, session, year, month):
+        """
+        Totaux des statuts par employé pour un mois, agrégés par le SGBD :
+        lignes (employee_id, present, absent, cong, tour_rep, repos_med, sans_ph).
+        Filtre sur un intervalle de dates (et non extract()) pour utiliser l'index sur date.
+        """
+        first = date(year, month, 1)
+        after = date(year + month // 12, month % 12 + 1, 1)
+        return session.execute(
+            select(cls.employee_id, *[db.func.coalesce(db.func.sum(getattr(cls, key)), 0).label(key)
+                                      for key in STATUS_KEYS])
+            .where(cls.date >= first, cls.date < after)
+            .group_by(cls.employee_id)
+            .order_by(cls.employee_id)
+        ).all()
+
+    @classmethod
+    def _bulk_upsert_select_first(cls, session, rows):
+        """Repli pour les autres SGBD : un SELECT des couples existants puis bulk insert/update."""
+        q = select(cls.id, cls.employee_id, cls.date).where(
+            tuple_(cls.employee_id, cls.date).in_([(r['employee_id'], r['date']) for r in rows])
+        )
+        existing = {(r.employee_id, r.date): r.id for r in session.execute(q)}
+
+        inserts = []
+        updates = []
+        for row in rows:
+            att_id = existing.get((row['employee_id'], row['date']))
+            if att_id is None:
+                inserts.append(row)
+            else:
+                updates.append(dict({key: row[key] for key in STATUS_KEYS}, id=att_id))
+
+        if inserts:
+            session.bulk_insert_mappings(cls, inserts)
+        if updates:
+            session.bulk_update_mappings(cls, updates)
+
+    def __repr__(self):
+        state = self.__dict__
+        return f"<Attendance emp_id={state.get('employee_id', '?')} date={state.get('date', '?')}>"
+
+
+class DataVersion(db.Model):
+    """
+    Version des données (ligne unique), incrémentée dans la transaction de chaque
+    import : jeton du cache du récapitulatif, partagé par tous les processus.
+    """
+    __tablename__ = 'data_version'
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
 
-    employee = db.relationship('Employee', back_populates='attendances')
+    @classmethod
+    def bump(cls, session):
+        """Incrémente la version dans la transaction en cours (visible au commit)."""
+        stmt = update(cls).where(cls.id == 1).values(version=cls.version + 1)
+        if session.execute(stmt).rowcount:
+            return
+        try:
+            with session.begin_nested():
+                session.add(cls(id=1, version=1))
+        except IntegrityError:
+            # ligne créée entre-temps par un import concurrent
+            session.execute(stmt)
 
-    __table_args__ = (db.UniqueConstraint('employee_id', 'date', name='_emp_date_uc'),)
+    @classmethod
+    def current(cls, session):
+        """Version courante (0 si aucun import n'a encore eu lieu)."""
+        return session.scalar(select(cls.version).where(cls.id == 1)) or 0
 
     def __repr__(self):
-        return f"<Attendance emp_id={self.employee_id} date={self.date}>"
+        return f"<DataVersion {self.__dict__.get('version', '?')}>"